@@ -1,2 +1,2 @@
-from .text2image import text2img, find_workflow_key, extract_and_remove_loras
-from .api_helpers import load_cache_models
+from .text2image import text2img, build_workflow_index, find_workflow_key, extract_and_remove_loras
+from .api_helpers import ComfyClient, load_cache_models
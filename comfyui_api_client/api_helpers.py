@@ -1,24 +1,47 @@
-import json
+"""
+Websocket-driven helpers for running prompts on a ComfyUI server.
+
+Pillow is imported lazily when images are decoded, so the first decoding call pays its import cost.
+"""
+
 import io
 import os
+import random
+import time
 import uuid
 import logging
-from typing import List, Dict, Tuple, Optional
-from websocket import WebSocket
-from PIL import Image
-from api.websocket_api import queue_prompt, get_history, get_image, upload_image, clear_comfy_cache
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, List, Dict, Tuple, Optional, Union
+from websocket import ABNF, WebSocket, WebSocketException
+from .websocket_api import _json_loads, queue_prompt, get_history, get_image, upload_image, clear_comfy_cache
+
+if TYPE_CHECKING:
+    from PIL import Image
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def open_websocket_connection(server_addr: str) -> Tuple[WebSocket, str, str]:
+def open_websocket_connection(
+    server_addr: str,
+    max_retries: int = 8,
+    base_delay: float = 0.5,
+    max_delay: float = 30.0,
+    jitter: float = 0.2,
+) -> Tuple[WebSocket, str, str]:
     """
     Open a websocket connection to the ComfyUI server.
 
+    Failed attempts are retried with exponential backoff and random jitter, so a briefly
+    unavailable server (e.g. during a restart) does not abort the caller.
+
     Args:
         server_addr (str): The address of the server (e.g., "127.0.0.1:8188").
+        max_retries (int): Maximum number of connection attempts (default is 8).
+        base_delay (float): Delay in seconds before the first retry (default is 0.5).
+        max_delay (float): Upper bound for the delay between retries in seconds (default is 30).
+        jitter (float): Relative random spread applied to each delay (default is 0.2).
 
     Returns:
         Tuple[WebSocket, str, str]: A tuple containing the WebSocket object, server address, and client ID.
@@ -26,16 +49,145 @@ def open_websocket_connection(server_addr: str) -> Tuple[WebSocket, str, str]:
     client_id = str(uuid.uuid4())
     ws = WebSocket()
 
-    try:
-        ws.connect(f"ws://{server_addr}/ws?clientId={client_id}")
-        logger.info(f"Connected to WebSocket server at {server_addr}")
-        return ws, server_addr, client_id
-    except Exception as e:
-        logger.error(f"Failed to connect to WebSocket at {server_addr}: {e}")
-        raise ConnectionError(f"Could not connect to the server at {server_addr}: {e}")
+    for attempt in range(max_retries):
+        try:
+            ws.connect(f"ws://{server_addr}/ws?clientId={client_id}")
+            logger.info(f"Connected to WebSocket server at {server_addr}")
+            return ws, server_addr, client_id
+        except (WebSocketException, OSError) as e:
+            if attempt == max_retries - 1:
+                logger.error(f"Failed to connect to WebSocket at {server_addr}: {e}")
+                raise ConnectionError(f"Could not connect to the server at {server_addr}: {e}")
+            delay = min(base_delay * 2**attempt, max_delay) * (1 + random.uniform(-jitter, jitter))
+            logger.warning(
+                f"WebSocket connection to {server_addr} failed (attempt {attempt + 1}/{max_retries}): {e}. "
+                f"Retrying in {delay:.2f} seconds."
+            )
+            time.sleep(delay)
+    raise ConnectionError(f"Could not connect to the server at {server_addr}: no connection attempts made")
+
+
+class ComfyClient:
+    """
+    A ComfyUI client that keeps one websocket connection open for many prompts.
 
+    A closed connection is reopened before the next prompt. If the connection drops while a
+    prompt is running, that call raises `ConnectionError` and the client reconnects for the next one.
 
-def generate_image_by_prompt(prompt: Dict, server_addr: str, save_previews: bool = False) -> List[Image.Image]:
+    Example:
+        with ComfyClient("127.0.0.1:8188") as client:
+            for prompt in prompts:
+                images = client.generate(prompt)
+    """
+
+    def __init__(self, server_addr: str, **connect_kwargs):
+        """
+        Args:
+            server_addr (str): The server address (e.g., "127.0.0.1:8188").
+            **connect_kwargs: Retry options forwarded to `open_websocket_connection`.
+        """
+        self.server_addr = server_addr
+        self.connect_kwargs = connect_kwargs
+        self.ws: Optional[WebSocket] = None
+        self.client_id: Optional[str] = None
+
+    def __enter__(self) -> "ComfyClient":
+        self.ws, self.server_addr, self.client_id = open_websocket_connection(self.server_addr, **self.connect_kwargs)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Close the websocket connection.
+        """
+        if self.ws is not None:
+            self.ws.close()
+            self.ws = None
+
+    def _ensure_connected(self) -> None:
+        if self.ws is None:
+            raise RuntimeError("ComfyClient is not connected; use it as a context manager")
+
+    def _reconnect(self) -> None:
+        try:
+            self.ws.close()
+        except Exception as e:
+            logger.debug(f"Ignoring error while closing the stale WebSocket: {e}")
+        self.ws, self.server_addr, self.client_id = open_websocket_connection(self.server_addr, **self.connect_kwargs)
+
+    def _run(self, prompt: Dict) -> str:
+        self._ensure_connected()
+        if not self.ws.connected:
+            logger.warning(f"WebSocket connection to {self.server_addr} was closed, reconnecting.")
+            self._reconnect()
+
+        prompt_id = queue_prompt(prompt, self.client_id, self.server_addr)["prompt_id"]
+        try:
+            track_progress(prompt, self.ws, prompt_id)
+        except ConnectionError:
+            # The running prompt cannot be tracked on a new connection, but later prompts can
+            logger.warning(f"Lost WebSocket connection to {self.server_addr}, reconnecting for the next prompt.")
+            self._reconnect()
+            raise
+        return prompt_id
+
+    def generate(
+        self, prompt: Dict, save_previews: bool = False, decode: bool = True
+    ) -> Union[List["Image.Image"], List[Dict]]:
+        """
+        Generate images by a provided prompt.
+
+        Args:
+            prompt (dict): The dictionary defining the generation prompt.
+            save_previews (bool): Whether to save preview images.
+            decode (bool): Whether to decode the images into PIL images (default is True).
+                When False, the raw image data dictionaries from `get_images` are returned.
+
+        Returns:
+            Union[List[Image.Image], List[Dict]]: A list of generated images or their raw data.
+        """
+        prompt_id = self._run(prompt)
+        images_data = get_images(prompt_id, self.server_addr, save_previews)
+        if not decode:
+            return images_data
+        from PIL import Image
+
+        return [Image.open(io.BytesIO(img["image_data"])) for img in images_data]
+
+    def load_cache(self, workflow: Dict) -> None:
+        """
+        Load models into cache.
+
+        Args:
+            workflow (dict): The workflow configuration.
+        """
+        self._run(workflow)
+
+    def generate_from_image(
+        self, prompt: Dict, output_path: str, input_path: str, filename: str, save_previews: bool = False
+    ) -> None:
+        """
+        Generate images using a prompt and an input image.
+
+        Args:
+            prompt (dict): The dictionary defining the generation prompt.
+            output_path (str): Path to save the output images.
+            input_path (str): Path to the input image.
+            filename (str): Name of the input image file.
+            save_previews (bool): Whether to save preview images.
+        """
+        self._ensure_connected()
+        upload_image(input_path, filename, self.server_addr, self.client_id)
+        prompt_id = self._run(prompt)
+        images = get_images(prompt_id, self.server_addr, save_previews)
+        save_images(images, output_path, save_previews)
+
+
+def generate_image_by_prompt(
+    prompt: Dict, server_addr: str, save_previews: bool = False, decode: bool = True
+) -> Union[List["Image.Image"], List[Dict]]:
     """
     Generate images by a provided prompt.
 
@@ -43,18 +195,14 @@ def generate_image_by_prompt(prompt: Dict, server_addr: str, save_previews: bool
         prompt (dict): The dictionary defining the generation prompt.
         server_addr (str): The server address (e.g., "127.0.0.1:8188").
         save_previews (bool): Whether to save preview images.
+        decode (bool): Whether to decode the images into PIL images (default is True).
+            When False, the raw image data dictionaries from `get_images` are returned.
 
     Returns:
-        List[Image.Image]: A list of generated images.
+        Union[List[Image.Image], List[Dict]]: A list of generated images or their raw data.
     """
-    ws, _, client_id = open_websocket_connection(server_addr)
-    try:
-        prompt_id = queue_prompt(prompt, client_id, server_addr)["prompt_id"]
-        track_progress(prompt, ws, prompt_id)
-        images_data = get_images(prompt_id, server_addr, save_previews)
-        return [Image.open(io.BytesIO(img["image_data"])) for img in images_data]
-    finally:
-        ws.close()
+    with ComfyClient(server_addr) as client:
+        return client.generate(prompt, save_previews, decode)
 
 
 def load_cache_models(workflow: Dict, server_addr: str) -> None:
@@ -65,12 +213,8 @@ def load_cache_models(workflow: Dict, server_addr: str) -> None:
         workflow (dict): The workflow configuration.
         server_addr (str): The server address (e.g., "127.0.0.1:8188").
     """
-    ws, _, client_id = open_websocket_connection(server_addr)
-    try:
-        prompt_id = queue_prompt(workflow, client_id, server_addr)["prompt_id"]
-        track_progress(workflow, ws, prompt_id)
-    finally:
-        ws.close()
+    with ComfyClient(server_addr) as client:
+        client.load_cache(workflow)
 
 
 def generate_image_by_prompt_and_image(
@@ -87,15 +231,8 @@ def generate_image_by_prompt_and_image(
         filename (str): Name of the input image file.
         save_previews (bool): Whether to save preview images.
     """
-    ws, _, client_id = open_websocket_connection(server_addr)
-    try:
-        upload_image(input_path, filename, server_addr, client_id)
-        prompt_id = queue_prompt(prompt, client_id, server_addr)["prompt_id"]
-        track_progress(prompt, ws, prompt_id)
-        images = get_images(prompt_id, server_addr, save_previews)
-        save_images(images, output_path, save_previews)
-    finally:
-        ws.close()
+    with ComfyClient(server_addr) as client:
+        client.generate_from_image(prompt, output_path, input_path, filename, save_previews)
 
 
 def save_images(images: List[Dict], output_path: str, save_previews: bool) -> None:
@@ -107,54 +244,89 @@ def save_images(images: List[Dict], output_path: str, save_previews: bool) -> No
         output_path (str): Path to save the images.
         save_previews (bool): Whether to save preview images.
     """
-    for img in images:
-        directory = os.path.join(output_path, "temp/") if img["type"] == "temp" and save_previews else output_path
+    directories = [
+        os.path.join(output_path, "temp/") if img["type"] == "temp" and save_previews else output_path
+        for img in images
+    ]
+    for directory in set(directories):
         os.makedirs(directory, exist_ok=True)
+
+    for img, directory in zip(images, directories):
+        path = os.path.join(directory, img["file_name"])
         try:
-            image = Image.open(io.BytesIO(img["image_data"]))
-            image.save(os.path.join(directory, img["file_name"]))
-            logger.info(f"Image saved: {os.path.join(directory, img['file_name'])}")
+            # The server already returns encoded image files, so write the bytes as they are
+            with open(path, "wb") as file:
+                file.write(img["image_data"])
+            logger.info(f"Image saved: {path}")
         except Exception as e:
             logger.error(f"Failed to save image {img['file_name']}: {e}")
 
 
-def track_progress(prompt: Dict, ws: WebSocket, prompt_id: str) -> None:
+def track_progress(
+    prompt: Dict, ws: WebSocket, prompt_id: str, progress_log_every: int = 10, log_interval: float = 0.1
+) -> None:
     """
     Track the execution progress of a prompt.
 
+    Only `executing` and `execution_cached` messages are fully parsed; sampler `progress`
+    messages are parsed and logged once every `progress_log_every` steps. Task progress
+    is logged at most once every `log_interval` seconds, except for the final count.
+
     Args:
         prompt (dict): The dictionary defining the generation prompt.
         ws (WebSocket): The WebSocket object.
         prompt_id (str): The ID of the prompt being tracked.
+        progress_log_every (int): Log every Nth sampler step; 0 or less disables step logging (default is 10).
+        log_interval (float): Minimum number of seconds between task progress logs (default is 0.1).
+
+    Raises:
+        ConnectionError: If the WebSocket connection fails before the prompt finishes.
     """
-    node_ids = list(prompt.keys())
+    total = len(prompt)
     finished_nodes = set()
+    progress_messages = 0
+    last_log_time = 0.0
+
+    def log_tasks_done() -> None:
+        nonlocal last_log_time
+        now = time.monotonic()
+        if now - last_log_time >= log_interval or len(finished_nodes) >= total:
+            last_log_time = now
+            logger.info(f"Progress: {len(finished_nodes)}/{total} Tasks done")
 
     while True:
         try:
-            message = ws.recv()
+            opcode, message = ws.recv_data()
         except Exception as e:
             logger.error(f"Error while receiving WebSocket message: {e}")
-            break
-
-        if isinstance(message, str):
-            data = json.loads(message)
-            msg_type = data.get("type")
-
-            if msg_type == "progress":
-                logger.info(f"In K-Sampler -> Step: {data['data']['value']} of {data['data']['max']}")
-            elif msg_type == "execution_cached":
-                for node in data["data"]["nodes"]:
-                    if node not in finished_nodes:
-                        finished_nodes.add(node)
-                        logger.info(f"Progress: {len(finished_nodes)}/{len(node_ids)} Tasks done")
-            elif msg_type == "executing":
-                node = data["data"]["node"]
-                if node and node not in finished_nodes:
-                    finished_nodes.add(node)
-                    logger.info(f"Progress: {len(finished_nodes)}/{len(node_ids)} Tasks done")
-                if node is None and data["data"]["prompt_id"] == prompt_id:
-                    break  # Execution is done
+            raise ConnectionError(f"WebSocket connection lost before prompt {prompt_id} finished: {e}") from e
+
+        # Binary frames are previews; skip them without decoding
+        if opcode != ABNF.OPCODE_TEXT:
+            continue
+
+        if b'"executing"' not in message and b'"execution_cached"' not in message:
+            if b'"progress"' not in message:
+                continue
+            progress_messages += 1
+            if progress_log_every <= 0 or progress_messages % progress_log_every:
+                continue
+
+        data = _json_loads(message)
+        msg_type = data.get("type")
+
+        if msg_type == "progress":
+            logger.info(f"In K-Sampler -> Step: {data['data']['value']} of {data['data']['max']}")
+        elif msg_type == "execution_cached":
+            finished_nodes.update(data["data"]["nodes"])
+            log_tasks_done()
+        elif msg_type == "executing":
+            node = data["data"]["node"]
+            if node and node not in finished_nodes:
+                finished_nodes.add(node)
+                log_tasks_done()
+            if node is None and data["data"]["prompt_id"] == prompt_id:
+                break  # Execution is done
 
 
 def get_images(prompt_id: str, server_addr: str, allow_preview: bool = False) -> List[Dict]:
@@ -169,18 +341,29 @@ def get_images(prompt_id: str, server_addr: str, allow_preview: bool = False) ->
     Returns:
         list[dict]: A list of dictionaries containing image data.
     """
-    output_images = []
     history = get_history(prompt_id, server_addr).get(prompt_id, {})
-    for node_id, node_output in history.get("outputs", {}).items():
-        for image in node_output.get("images", []):
-            image_data = None
-            if allow_preview and image["type"] == "temp":
-                image_data = get_image(image["filename"], image["subfolder"], image["type"], server_addr)
-            elif image["type"] == "output":
-                image_data = get_image(image["filename"], image["subfolder"], image["type"], server_addr)
-            if image_data:
-                output_images.append({"image_data": image_data, "file_name": image["filename"], "type": image["type"]})
-    return output_images
+    images = [
+        image
+        for node_output in history.get("outputs", {}).values()
+        for image in node_output.get("images", [])
+        if image["type"] == "output" or (allow_preview and image["type"] == "temp")
+    ]
+    if not images:
+        return []
+
+    # Downloads are I/O-bound, so fetch them concurrently over the pooled session
+    with ThreadPoolExecutor(max_workers=min(8, len(images))) as executor:
+        blobs = list(
+            executor.map(
+                lambda image: get_image(image["filename"], image["subfolder"], image["type"], server_addr), images
+            )
+        )
+
+    return [
+        {"image_data": image_data, "file_name": image["filename"], "type": image["type"]}
+        for image, image_data in zip(images, blobs)
+        if image_data
+    ]
 
 
 def clear(server_addr: str, unload_models: bool = False, free_memory: bool = False) -> None:
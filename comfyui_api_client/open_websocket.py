@@ -1,13 +1,20 @@
-import websocket  # NOTE: websocket-client (https://github.com/websocket-client/websocket-client)
-import uuid
 import os
+from typing import Tuple
+from websocket import WebSocket
+from .api_helpers import open_websocket_connection as _open_websocket_connection
 
 
-def open_websocket_connection():
-    server_address = os.getenv("COMFYUI_SERVER_ADDRESS", "127.0.0.1:8188")
-    print(server_address)
-    client_id = str(uuid.uuid4())
+def open_websocket_connection(**connect_kwargs) -> Tuple[WebSocket, str, str]:
+    """
+    Open a websocket connection to the server from the `COMFYUI_SERVER_ADDRESS` environment variable.
+
+    Kept for backward compatibility; delegates to `api_helpers.open_websocket_connection`.
 
-    ws = websocket.WebSocket()
-    ws.connect("ws://{}/ws?clientId={}".format(server_address, client_id))
-    return ws, server_address, client_id
+    Args:
+        **connect_kwargs: Retry options forwarded to `api_helpers.open_websocket_connection`.
+
+    Returns:
+        Tuple[WebSocket, str, str]: A tuple containing the WebSocket object, server address, and client ID.
+    """
+    server_address = os.getenv("COMFYUI_SERVER_ADDRESS", "127.0.0.1:8188")
+    return _open_websocket_connection(server_address, **connect_kwargs)
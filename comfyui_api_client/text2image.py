@@ -2,6 +2,7 @@ import os
 import re
 import time
 import logging
+from functools import lru_cache
 from typing import Tuple, List, Dict, Any, Optional
 from .api_helpers import generate_image_by_prompt
 
@@ -9,6 +10,23 @@ from .api_helpers import generate_image_by_prompt
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_LORA_RE = re.compile(r"<lora:([a-zA-Z0-9\-_.]+):([\d.]+)>")
+
+
+@lru_cache(maxsize=8)
+def _list_loras(loras_dir: str, mtime_ns: int) -> Tuple[str, ...]:
+    """
+    List the files of a LoRA directory, cached per directory modification time.
+
+    Args:
+        loras_dir (str): Directory containing LoRA files.
+        mtime_ns (int): Modification time of the directory, used to invalidate the cache.
+
+    Returns:
+        Tuple[str, ...]: File names in the directory.
+    """
+    return tuple(os.listdir(loras_dir))
+
 
 def find_available_lora_by_name(loras_dir: str, name: str) -> Optional[str]:
     """
@@ -21,9 +39,10 @@ def find_available_lora_by_name(loras_dir: str, name: str) -> Optional[str]:
     Returns:
         Optional[str]: Path to the LoRA file if found, otherwise None.
     """
-    for file in os.listdir(loras_dir):
-        if name in file:
-            return os.path.join(loras_dir, file)
+    files = _list_loras(loras_dir, os.stat(loras_dir).st_mtime_ns)
+    file = next((file for file in files if name in file), None)
+    if file is not None:
+        return os.path.join(loras_dir, file)
     logger.warning(f"LoRA '{name}' not found in directory: {loras_dir}")
     return None
 
@@ -38,14 +57,21 @@ def extract_and_remove_loras(input_string: str) -> Tuple[List[Dict[str, Any]], s
     Returns:
         Tuple[List[Dict[str, Any]], str]: A list of LoRAs with their weights, and the cleaned prompt string.
     """
-    pattern = r"<lora:([a-zA-Z0-9\-_.]+):([\d.]+)>"
-    matches = re.findall(pattern, input_string)
-    loras = [{"name": match[0], "weight": float(match[1])} for match in matches]
-    cleaned_string = re.sub(pattern, "", input_string).strip()
+    loras = []
+    parts = []
+    last_end = 0
+    for match in _LORA_RE.finditer(input_string):
+        loras.append({"name": match.group(1), "weight": float(match.group(2))})
+        parts.append(input_string[last_end : match.start()])
+        last_end = match.end()
+    parts.append(input_string[last_end:])
+    cleaned_string = "".join(parts).strip()
     return loras, cleaned_string
 
 
-def add_loras_to_workflow(workflow: Dict, loras: List[Dict], loras_dir: str) -> Dict:
+def add_loras_to_workflow(
+    workflow: Dict, loras: List[Dict], loras_dir: str, index: Optional[Dict[str, List[str]]] = None
+) -> Dict:
     """
     Add LoRAs to the workflow configuration.
 
@@ -53,11 +79,15 @@ def add_loras_to_workflow(workflow: Dict, loras: List[Dict], loras_dir: str) ->
         workflow (dict): The workflow configuration dictionary.
         loras (list[dict]): A list of LoRAs with their weights.
         loras_dir (str): Directory containing LoRA files.
+        index (dict, optional): Class type index from `build_workflow_index` to avoid rescanning the workflow.
 
     Returns:
         dict: Updated workflow configuration with LoRAs added.
     """
-    key = find_workflow_key(workflow, "Power Lora Loader (rgthree)")
+    if not loras:
+        return workflow
+
+    key = find_workflow_key(workflow, "Power Lora Loader (rgthree)", index)
     if key is None:
         logger.error("No 'Power Lora Loader' node found in the workflow.")
         return workflow
@@ -78,30 +108,54 @@ def add_loras_to_workflow(workflow: Dict, loras: List[Dict], loras_dir: str) ->
     return workflow
 
 
-def find_workflow_key(workflow: Dict, key: str) -> Optional[str]:
+def build_workflow_index(workflow: Dict) -> Dict[str, List[str]]:
+    """
+    Group workflow node keys by their class type.
+
+    Args:
+        workflow (dict): The workflow configuration dictionary.
+
+    Returns:
+        dict: Mapping of class type to the keys of the nodes with that class type, lowest numeric key first.
+    """
+    index = {}
+    for workflow_key, workflow_data in workflow.items():
+        if isinstance(workflow_data, dict):
+            index.setdefault(workflow_data.get("class_type"), []).append(workflow_key)
+    for keys in index.values():
+        keys.sort(key=lambda k: (0, int(k), "") if str(k).isdigit() else (1, 0, str(k)))
+    return index
+
+
+def find_workflow_key(workflow: Dict, key: str, index: Optional[Dict[str, List[str]]] = None) -> Optional[str]:
     """
     Find a workflow node by its class type.
 
     Args:
         workflow (dict): The workflow configuration dictionary.
         key (str): The class type of the node to search for.
+        index (dict, optional): Class type index from `build_workflow_index` to avoid rescanning the workflow.
+            The caller must rebuild it after replacing, adding or removing nodes.
 
     Returns:
         Optional[str]: Key of the workflow node if found, otherwise None.
     """
-    for workflow_key, workflow_data in workflow.items():
-        if workflow_data.get("class_type") == key:
-            if key == "CLIPTextEncode" and workflow_data["inputs"].get("text") != "":
-                continue
-            return workflow_key
+    if index is None:
+        index = build_workflow_index(workflow)
+    for workflow_key in index.get(key, []):
+        if key == "CLIPTextEncode" and workflow[workflow_key]["inputs"].get("text") != "":
+            continue
+        return workflow_key
     logger.warning(f"No node with class type '{key}' found in the workflow.")
     return None
 
-def extract_prompts_ids(workflow):
+def extract_prompts_ids(workflow, index=None):
     # 'KSampler Adv. (Efficient)'
-    key = find_workflow_key(workflow, "KSampler")
+    if index is None:
+        index = build_workflow_index(workflow)
+    key = find_workflow_key(workflow, "KSampler", index)
     if key is None:
-        key = find_workflow_key(workflow, 'KSampler Adv. (Efficient)')
+        key = find_workflow_key(workflow, 'KSampler Adv. (Efficient)', index)
 
     ksampler = workflow[key]
     print(ksampler)
@@ -146,18 +200,21 @@ def text2img(
     # Extract LoRAs from the positive prompt
     loras, cleaned_positive_prompt = extract_and_remove_loras(positive_prompt)
 
+    # Index nodes by class type once instead of rescanning the workflow for every lookup
+    index = build_workflow_index(workflow)
+
     # Update workflow with prompts and parameters
-    positive_id, negative_id = extract_prompts_ids(workflow=workflow)
+    positive_id, negative_id = extract_prompts_ids(workflow=workflow, index=index)
     workflow[positive_id], workflow[negative_id] = cleaned_positive_prompt, negative_prompt
-    workflow[find_workflow_key(workflow, "EmptyLatentImage")]["inputs"] = {
+    workflow[find_workflow_key(workflow, "EmptyLatentImage", index)]["inputs"] = {
         "width": width,
         "height": height,
         "batch_size": batch_size,
     }
-    workflow[find_workflow_key(workflow, "Seed (rgthree)")]["inputs"]["seed"] = seed
+    workflow[find_workflow_key(workflow, "Seed (rgthree)", index)]["inputs"]["seed"] = seed
 
     # Add LoRAs to the workflow
-    workflow = add_loras_to_workflow(workflow, loras, loras_dir)
+    workflow = add_loras_to_workflow(workflow, loras, loras_dir, index)
 
     # Generate images
     logger.info("Starting image generation...")
@@ -1,14 +1,40 @@
+"""
+HTTP helpers for the ComfyUI REST endpoints.
+
+requests_toolbelt is imported lazily by `upload_image`, so the first upload pays its import cost.
+"""
+
 import json
 import logging
-import urllib.request
-import urllib.parse
-from typing import Dict, Any
-from requests_toolbelt import MultipartEncoder
+from functools import lru_cache, partial
+from typing import TYPE_CHECKING, Dict, Any, Callable, Optional
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+
+    _json_dumps = partial(orjson.dumps, option=orjson.OPT_NON_STR_KEYS)
+    _json_loads = orjson.loads
+except ImportError:
+
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+    _json_loads = json.loads
+
+if TYPE_CHECKING:
+    from requests_toolbelt import MultipartEncoderMonitor
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Shared HTTP session so every REST call reuses pooled keep-alive connections
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(pool_connections=16, pool_maxsize=64))
+_SESSION.headers.update({"Connection": "keep-alive"})
+
 
 def upload_image(
     input_path: str,
@@ -17,6 +43,7 @@ def upload_image(
     client_id: str = "",
     image_type: str = "input",
     overwrite: bool = False,
+    progress_callback: Optional[Callable[["MultipartEncoderMonitor"], None]] = None,
 ) -> Dict[str, Any]:
     """
     Upload an image to the ComfyUI server.
@@ -28,10 +55,13 @@ def upload_image(
         client_id (str): Optional client ID for tracking (default is empty).
         image_type (str): Image type, either "input" or another type (default is "input").
         overwrite (bool): Whether to overwrite an existing image (default is False).
+        progress_callback (Callable, optional): Called with the encoder monitor as each chunk is sent.
 
     Returns:
         dict: Response from the server.
     """
+    from requests_toolbelt import MultipartEncoder, MultipartEncoderMonitor
+
     try:
         with open(input_path, "rb") as file:
             multipart_data = MultipartEncoder(
@@ -42,14 +72,16 @@ def upload_image(
                     "client_id": client_id,
                 }
             )
+            if progress_callback is not None:
+                multipart_data = MultipartEncoderMonitor(multipart_data, progress_callback)
 
+            # The encoder is streamed from the open file in chunks rather than buffered in memory
             headers = {"Content-Type": multipart_data.content_type}
             url = f"http://{server_address}/upload/image"
-            request = urllib.request.Request(url, data=multipart_data, headers=headers)
-
-            with urllib.request.urlopen(request) as response:
-                logger.info(f"Image '{name}' uploaded successfully to {server_address}.")
-                return json.loads(response.read())
+            response = _SESSION.post(url, data=multipart_data, headers=headers, stream=False)
+            response.raise_for_status()
+            logger.info(f"Image '{name}' uploaded successfully to {server_address}.")
+            return _json_loads(response.content)
     except Exception as e:
         logger.error(f"Failed to upload image '{name}' to {server_address}: {e}")
         raise
@@ -68,15 +100,15 @@ def queue_prompt(prompt: Dict, client_id: str, server_address: str) -> Dict:
         dict: Response from the server containing the prompt ID.
     """
     try:
-        data = json.dumps({"prompt": prompt, "client_id": client_id}).encode("utf-8")
+        data = _json_dumps({"prompt": prompt, "client_id": client_id})
         headers = {"Content-Type": "application/json"}
         url = f"http://{server_address}/prompt"
 
-        req = urllib.request.Request(url, data=data, headers=headers)
-        with urllib.request.urlopen(req) as response:
-            result = json.loads(response.read())
-            logger.info(f"Prompt queued successfully: {result}")
-            return result
+        response = _SESSION.post(url, data=data, headers=headers)
+        response.raise_for_status()
+        result = _json_loads(response.content)
+        logger.info(f"Prompt queued successfully: {result}")
+        return result
     except Exception as e:
         logger.error(f"Failed to queue prompt on {server_address}: {e}")
         raise
@@ -94,11 +126,12 @@ def interrupt_prompt(server_address: str) -> Dict:
     """
     try:
         url = f"http://{server_address}/interrupt"
-        req = urllib.request.Request(url, data={}.encode("utf-8"))
-        with urllib.request.urlopen(req) as response:
-            result = json.loads(response.read())
-            logger.info("Prompt interrupted successfully.")
-            return result
+        response = _SESSION.post(url)
+        response.raise_for_status()
+        # ComfyUI answers /interrupt with an empty body
+        result = _json_loads(response.content) if response.content else {}
+        logger.info("Prompt interrupted successfully.")
+        return result
     except Exception as e:
         logger.error(f"Failed to interrupt prompt on {server_address}: {e}")
         raise
@@ -118,13 +151,13 @@ def get_image(filename: str, subfolder: str, folder_type: str, server_address: s
         bytes: The raw image data.
     """
     try:
-        data = {"filename": filename, "subfolder": subfolder, "type": folder_type}
-        query_string = urllib.parse.urlencode(data)
-        url = f"http://{server_address}/view?{query_string}"
+        params = {"filename": filename, "subfolder": subfolder, "type": folder_type}
+        url = f"http://{server_address}/view"
 
-        with urllib.request.urlopen(url) as response:
-            logger.info(f"Image '{filename}' retrieved successfully from {server_address}.")
-            return response.read()
+        response = _SESSION.get(url, params=params)
+        response.raise_for_status()
+        logger.info(f"Image '{filename}' retrieved successfully from {server_address}.")
+        return response.content
     except Exception as e:
         logger.error(f"Failed to retrieve image '{filename}' from {server_address}: {e}")
         raise
@@ -143,19 +176,38 @@ def get_history(prompt_id: str, server_address: str) -> Dict:
     """
     try:
         url = f"http://{server_address}/history/{prompt_id}"
-        with urllib.request.urlopen(url) as response:
-            history = json.loads(response.read())
-            logger.info(f"History for prompt ID '{prompt_id}' retrieved successfully.")
-            return history
+        response = _SESSION.get(url)
+        response.raise_for_status()
+        history = _json_loads(response.content)
+        logger.info(f"History for prompt ID '{prompt_id}' retrieved successfully.")
+        return history
     except Exception as e:
         logger.error(f"Failed to retrieve history for prompt ID '{prompt_id}' from {server_address}: {e}")
         raise
 
 
+@lru_cache(maxsize=256)
+def _fetch_node_info(server_address: str, node_class: str) -> Dict:
+    try:
+        url = f"http://{server_address}/object_info/{node_class}"
+        response = _SESSION.get(url)
+        response.raise_for_status()
+        info = _json_loads(response.content)
+        logger.info(f"Node info for class '{node_class}' retrieved successfully.")
+        return info
+    except Exception as e:
+        logger.error(f"Failed to retrieve node info for class '{node_class}' from {server_address}: {e}")
+        raise
+
+
 def get_node_info_by_class(node_class: str, server_address: str) -> Dict:
     """
     Retrieve information about a node class from the ComfyUI server.
 
+    Results are cached per server address and node class. The returned dict is shared
+    between callers and must not be modified. Call `get_node_info_by_class.cache_clear()`
+    after the server reloads its nodes.
+
     Args:
         node_class (str): The name of the node class.
         server_address (str): The server address (e.g., "127.0.0.1:8188").
@@ -163,15 +215,10 @@ def get_node_info_by_class(node_class: str, server_address: str) -> Dict:
     Returns:
         dict: Information about the node class.
     """
-    try:
-        url = f"http://{server_address}/object_info/{node_class}"
-        with urllib.request.urlopen(url) as response:
-            info = json.loads(response.read())
-            logger.info(f"Node info for class '{node_class}' retrieved successfully.")
-            return info
-    except Exception as e:
-        logger.error(f"Failed to retrieve node info for class '{node_class}' from {server_address}: {e}")
-        raise
+    return _fetch_node_info(server_address, node_class)
+
+
+get_node_info_by_class.cache_clear = _fetch_node_info.cache_clear
 
 
 def clear_comfy_cache(server_address: str, unload_models: bool = False, free_memory: bool = False) -> Dict:
@@ -188,13 +235,15 @@ def clear_comfy_cache(server_address: str, unload_models: bool = False, free_mem
     """
     try:
         clear_data = {"unload_models": unload_models, "free_memory": free_memory}
-        data = json.dumps(clear_data).encode("utf-8")
+        data = _json_dumps(clear_data)
         url = f"http://{server_address}/free"
 
-        with urllib.request.urlopen(url, data=data) as response:
-            result = json.loads(response.read())
-            logger.info("ComfyUI cache cleared successfully.")
-            return result
+        response = _SESSION.post(url, data=data)
+        response.raise_for_status()
+        # ComfyUI answers /free with an empty body
+        result = _json_loads(response.content) if response.content else {}
+        logger.info("ComfyUI cache cleared successfully.")
+        return result
     except Exception as e:
         logger.error(f"Failed to clear ComfyUI cache on {server_address}: {e}")
         raise
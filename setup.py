@@ -14,6 +14,8 @@ setup(
     install_requires=[
         "Pillow==10.2.0",
         "websocket-client==1.7.0",
+        "orjson>=3.9.0",
+        "requests>=2.31.0",
         "requests_toolbelt==1.0.0",
     ],
     classifiers=[
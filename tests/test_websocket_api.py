@@ -0,0 +1,20 @@
+import unittest
+from unittest import mock
+
+from comfyui_api_client import websocket_api
+
+
+class InterruptPromptTest(unittest.TestCase):
+    def test_posts_without_body_and_accepts_empty_response(self):
+        response = mock.Mock(content=b"")
+        with mock.patch.object(websocket_api._SESSION, "post", return_value=response) as post:
+            result = websocket_api.interrupt_prompt("127.0.0.1:8188")
+
+        post.assert_called_once_with("http://127.0.0.1:8188/interrupt")
+        self.assertNotIn("data", post.call_args.kwargs)
+        response.raise_for_status.assert_called_once_with()
+        self.assertEqual(result, {})
+
+
+if __name__ == "__main__":
+    unittest.main()